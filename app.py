@@ -21,20 +21,76 @@
 # -- filename, with value a string comprising the filename after download
 # -- extract_zip, with value a Boolean equivalent to either True or False
 # -- zip_member_to_extract, with value a string comprising the file to extract
-# from the downloaded file to a subdirectory of same name as zip file
+# from the downloaded file
 # -- zip_member_final_destination, with value a string giving the final location
-# to which the zip file member should be copied after extraction
+# to which the zip file member should be extracted
+# -- parallel_parts, optionally, with value an integer giving the number of
+# concurrent HTTP range requests to split a get method download into, if the
+# server supports byte ranges (default 1)
+# Optionally, "config.py" may also define the following constants:
+# - MAX_DOWNLOAD_WORKERS, an integer giving the number of download actions to
+# attempt concurrently (default 4)
+# - ARCHIVE_ZIP_MEMBERS, a Boolean giving whether extracted zip file members
+# should also be kept in a subdirectory of config.DOWNLOAD_ARCHIVE_DIRECTORY of
+# same name as zip file (default False)
+# - REUSE_SESSION, a Boolean giving whether login session cookies should be
+# saved in config.DOWNLOAD_ARCHIVE_DIRECTORY and reused by later runs instead
+# of logging in again, which also requires SESSION_CHECK_PATH (default False)
+# - SESSION_MAX_AGE, a number giving the age in seconds after which saved login
+# session cookies are no longer reused (default 1800)
+# - SESSION_CHECK_PATH, a string giving the path to an action requiring login,
+# which is used to check that saved login session cookies are still accepted,
+# with a redirect or a 401 or 403 response causing a new login
+# Debug messages are logged only if environment variable APP_LOG is set to
+# 'debug'.
 
+import atexit
+import collections
+import concurrent.futures
+import http.cookiejar
+import json
 import logging
+import os
 import pathlib
+import queue
 import shutil
 import sys
+import threading
 import time
 import zipfile
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
+# set number of connections kept alive per host by the login session
+HTTP_POOL_SIZE = 32
+
+# set number of bytes read from a download response per write to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# set largest download size, in bytes, read into memory in full before being
+# written to disk
+MAX_PREALLOCATED_DOWNLOAD_SIZE = 16 * 1024 * 1024
+
+# set number of bytes read from a zip file member per write to disk
+ZIP_COPY_SIZE = 1 << 20
+
+# map each supported download method to a function sending a streamed request
+# for a DownloadAction, with metadata used either for post method form data or
+# get method params
+_METHOD_DISPATCH = {
+    'GET': lambda s, a, h=None: s.get(
+        a.url, params=a.metadata, headers=h, stream=True
+    ),
+    'POST': lambda s, a, h=None: s.post(
+        a.url, data=a.metadata, headers=h, stream=True
+    ),
+}
+
 # record script start time to use in calculating a total script execution time
 script_start_time = time.perf_counter()
 
@@ -55,9 +111,16 @@ except FileExistsError as e:
         f'{log_directory.absolute()} must be a directory or not yet exist'
     ) from e
 
-# set logfile location using directory specified in config file
+# set logfile location using directory specified in config file, with the
+# logfile opened in append mode when the first record is written
 log_file_location = log_directory / config.LOG_FILE_NAME
-log_handler = logging.FileHandler(log_file_location.absolute(), mode='a')
+log_path_str = str(log_file_location)
+log_handler = logging.FileHandler(
+    log_path_str,
+    mode='a',
+    encoding='utf-8',
+    delay=True,
+)
 
 # create secondary logger to console output
 screen_handler = logging.StreamHandler(stream=sys.stdout)
@@ -70,11 +133,115 @@ log_formatter = logging.Formatter(
 log_handler.setFormatter(log_formatter)
 screen_handler.setFormatter(log_formatter)
 
-# create logger to simultaneously write to both logfile and console output
+
+# define buffering log handler, which writes each batch of buffered records to
+# its logfile handler target using a single gather-write system call, where
+# supported by the OS
+class WritevMemoryHandler(MemoryHandler):
+    """MemoryHandler writing buffered records to a FileHandler with writev"""
+
+    # maximum number of buffers passed to a single writev call
+    max_buffers = 1024
+
+    def flush(self):
+        if not (
+            hasattr(os, 'writev')
+            and isinstance(self.target, logging.FileHandler)
+        ):
+            super().flush()
+            return
+        with self.lock:
+            if not self.buffer:
+                return
+            target = self.target
+            records = [
+                record for record in self.buffer
+                if record.levelno >= target.level and target.filter(record)
+            ]
+            with target.lock:
+                # open a delayed logfile on first write, but do not reopen one
+                # that has been closed, as CPython's FileHandler.emit does
+                # using its private _open method and _closed attribute
+                if target.stream is None:
+                    if getattr(target, '_closed', False):
+                        self.buffer.clear()
+                        return
+                    try:
+                        target.stream = target._open()
+                    except Exception:
+                        target.handleError(self.buffer[0])
+                        self.buffer.clear()
+                        return
+                # format and encode each record separately, so that a record
+                # which cannot be formatted or encoded is reported and skipped
+                # without losing the rest of the batch
+                encoding = target.encoding or 'utf-8'
+                errors = getattr(target, 'errors', None) or 'strict'
+                data = []
+                for record in records:
+                    try:
+                        data.append(
+                            (target.format(record) + target.terminator).encode(
+                                encoding,
+                                errors,
+                            )
+                        )
+                    except Exception:
+                        target.handleError(record)
+                try:
+                    target.stream.flush()
+                    fd = target.stream.fileno()
+                    for i in range(0, len(data), self.max_buffers):
+                        batch = data[i:i + self.max_buffers]
+                        written = os.writev(fd, batch)
+                        if written < sum(map(len, batch)):
+                            remaining = memoryview(b''.join(batch))[written:]
+                            while remaining:
+                                remaining = remaining[os.write(fd, remaining):]
+                except Exception:
+                    target.handleError(self.buffer[0])
+            self.buffer.clear()
+
+
+# buffer logfile records so that they are written in batches, with the buffer
+# flushed when full, when an error is logged, at least once per second, and
+# at script exit
+buffered_log_handler = WritevMemoryHandler(
+    capacity=512,
+    flushLevel=logging.ERROR,
+    target=log_handler,
+    flushOnClose=True,
+)
+atexit.register(buffered_log_handler.close)
+
+
+def flush_log_buffer_periodically(interval=1.0):
+    """Flush buffered logfile records every interval seconds"""
+    while True:
+        time.sleep(interval)
+        buffered_log_handler.flush()
+
+
+threading.Thread(target=flush_log_buffer_periodically, daemon=True).start()
+
+# create logger to simultaneously write to both logfile and console output,
+# logging debug messages only if environment variable APP_LOG is set to debug;
+# records are only enqueued by the logger, with a listener thread writing them
+# to both outputs, so that logging does not block on disk or console I/O
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(
+    log_queue,
+    buffered_log_handler,
+    screen_handler,
+    respect_handler_level=True,
+)
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
-logger.addHandler(log_handler)
-logger.addHandler(screen_handler)
+logger.setLevel(
+    logging.DEBUG if os.environ.get('APP_LOG') == 'debug' else logging.INFO
+)
+logger.addHandler(QueueHandler(log_queue))
 
 # test that logging system was successfully created
 try:
@@ -86,127 +253,622 @@ except Exception as e:
 
 # create download archive directory specified in config module
 download_directory = pathlib.Path(config.DOWNLOAD_ARCHIVE_DIRECTORY)
-logger.info(f'Download archive path is {download_directory.absolute()}')
+download_directory_str = str(download_directory.resolve())
+logger.info(f'Download archive path is {download_directory_str}')
 try:
     download_directory.mkdir(parents=True, exist_ok=True)
 except FileExistsError as e:
-    m = f'{download_directory.absolute()} must be a directory or not yet exist'
+    m = f'{download_directory_str} must be a directory or not yet exist'
     logger.exception(m)
     raise NotADirectoryError(m) from e
 
-# create login session specified in config module
-login_session = requests.Session()
-logger.info(f'Now attempting to log into {config.BASE_URL}')
+# set whether extracted zip file members are kept in the download archive, as
+# set by optional config constant ARCHIVE_ZIP_MEMBERS
+archive_zip_members = getattr(config, 'ARCHIVE_ZIP_MEMBERS', False)
+
+# load ETag and Last-Modified values recorded for previously downloaded files,
+# which are used to skip get method downloads unchanged since the last run
+download_validators_location = download_directory / '.etag_cache.json'
 try:
-    login_response = login_session.post(
-        config.BASE_URL + config.LOGIN_PATH,
-        data=config.LOGIN_HEADERS
+    with open(download_validators_location) as fp:
+        download_validators = json.load(fp)
+    if not (
+        isinstance(download_validators, dict)
+        and all(
+            isinstance(validators, list)
+            and len(validators) == 2
+            and all(
+                validator is None or isinstance(validator, str)
+                for validator in validators
+            )
+            for validators in download_validators.values()
+        )
+    ):
+        raise ValueError(
+            'Expected a dict mapping each filename to an ETag and a'
+            ' Last-Modified value'
+        )
+except FileNotFoundError:
+    download_validators = {}
+except (ValueError, IOError) as e:
+    logger.exception(
+        f'{download_validators_location} could not be read, so all files'
+        f' will be downloaded'
     )
-    logger.debug(f'HTTP headers: {login_response.headers}')
-    login_response.raise_for_status()
-except requests.exceptions.RequestException as e:
-    m = 'unable to establish network connection'
-    logger.exception(m)
-    raise requests.exceptions.ConnectionError(m) from e
+    download_validators = {}
 
-# iterate through all values in download actions dict; each download action
-# value is also iterate over until a successful download is obtained
+# normalize download actions specified in config module once, before any
+# download is attempted, into a dict mapping each download action to a list
+# of DownloadAction records with method names and paths precomputed, failing
+# fast if any download method is unsupported
+DownloadAction = collections.namedtuple(
+    'DownloadAction',
+    [
+        'instructions',
+        'method',
+        'url',
+        'metadata',
+        'destination',
+        'extract_zip',
+        'zip_member',
+        'final_destination',
+        'parallel_parts',
+    ],
+)
+download_actions = {}
 for k, v_list in config.DOWNLOAD_ACTIONS.items():
     if not isinstance(v_list, list):
         v_list = [v_list]
+    download_actions[k] = []
     for v in v_list:
-        logger.info(
-            f'Now attempting download "{k}" using method {v["method"]} and'
-            f' metadata {v["metadata"]}'
-        )
-        logger.debug(f'Full download instructions: {v}')
-        if v['method'].upper().strip() == 'POST':
-            download_response = login_session.post(
-                v['URL'],
-                data=v['metadata'],
-                stream=True
-            )
-        elif v['method'].upper().strip() == 'GET':
-            download_response = login_session.get(
-                v['URL'],
-                params=v['metadata'],
-                stream=True
-            )
-        else:
-            m = f'Download "{v}" method {v["method"]} is unsupported'
-            logger.exception(m)
+        method = v['method'].upper().strip()
+        if method not in _METHOD_DISPATCH:
+            m = f'Download "{k}" method {v["method"]} is unsupported'
+            logger.error(m)
             raise ValueError(m)
-        if download_response.status_code == requests.codes.ok:
-            logger.info(f'Download "{k}" was successful started')
-            download_destination = download_directory / v['filename']
-            try:
-                with open(download_destination, 'wb') as fp:
-                    download_response.raw.decode_content = True
-                    shutil.copyfileobj(download_response.raw, fp)
-                    logger.info(f'Download "{k}" was successful completed')
-                    break
-            except (requests.exceptions.ConnectionError, IOError) as e:
-                    logger.exception(f'Download "{k}" was unsuccessful')
+        download_actions[k].append(
+            DownloadAction(
+                instructions=v,
+                method=method,
+                url=v['URL'],
+                metadata=v['metadata'],
+                destination=download_directory / v['filename'],
+                extract_zip=v['extract_zip'],
+                zip_member=v['zip_member_to_extract'],
+                final_destination=(
+                    pathlib.Path(v['zip_member_final_destination'])
+                    if v['zip_member_final_destination'] else None
+                ),
+                parallel_parts=v.get('parallel_parts', 1),
+            )
+        )
 
-        else:
-            logger.warning(
-                f'Download "{k}" using method {v["method"]} and metadata'
-                f' {v["metadata"]} could *NOT* be started'
+# create login session specified in config module, with keep-alive connection
+# pools large enough for the number of download actions attempted concurrently,
+# as set by optional config constant MAX_DOWNLOAD_WORKERS, and with transient
+# server errors retried
+max_download_workers = getattr(config, 'MAX_DOWNLOAD_WORKERS', 4)
+login_session = requests.Session()
+login_session.headers.update({'Connection': 'keep-alive'})
+download_adapter = HTTPAdapter(
+    pool_connections=HTTP_POOL_SIZE,
+    pool_maxsize=max(HTTP_POOL_SIZE, max_download_workers),
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False,
+    ),
+)
+login_session.mount('http://', download_adapter)
+login_session.mount('https://', download_adapter)
+
+# set whether login session cookies are saved for reuse by later runs, as set
+# by optional config constants REUSE_SESSION and SESSION_MAX_AGE
+reuse_session = getattr(config, 'REUSE_SESSION', False)
+session_max_age = getattr(config, 'SESSION_MAX_AGE', 30 * 60)
+session_cookies_location = download_directory / '.session_cookies.lwp'
+
+
+def load_session_cookies():
+    """Load login session cookies saved by a recent run into login_session
+
+    Returns True if cookies were loaded and the server accepted them at
+    config constant SESSION_CHECK_PATH, which is required for reuse
+    """
+    session_check_path = getattr(config, 'SESSION_CHECK_PATH', None)
+    if session_check_path is None:
+        logger.warning(
+            'REUSE_SESSION requires SESSION_CHECK_PATH to be set, so saved'
+            ' login session cookies will not be reused'
+        )
+        return False
+    try:
+        cookies_age = (
+            time.time() - session_cookies_location.stat().st_mtime
+        )
+        if cookies_age > session_max_age:
+            return False
+        saved_cookies = http.cookiejar.LWPCookieJar()
+        saved_cookies.load(str(session_cookies_location), ignore_discard=True)
+        login_session.cookies.update(saved_cookies)
+    except FileNotFoundError:
+        return False
+    except IOError as e:
+        logger.exception(f'{session_cookies_location} could not be read')
+        login_session.cookies.clear()
+        return False
+    # treat a redirect, typically to a login page, the same as a refusal
+    try:
+        with login_session.get(
+            config.BASE_URL + session_check_path,
+            allow_redirects=False,
+        ) as check_response:
+            if 300 <= check_response.status_code < 400 or (
+                check_response.status_code in (
+                    requests.codes.unauthorized,
+                    requests.codes.forbidden,
+                )
+            ):
+                logger.info(
+                    f'Saved login session was refused with status'
+                    f' {check_response.status_code} by'
+                    f' {config.BASE_URL + session_check_path}'
+                )
+                login_session.cookies.clear()
+                return False
+    except requests.exceptions.RequestException as e:
+        logger.exception(
+            f'Saved login session could not be checked using'
+            f' {config.BASE_URL + session_check_path}'
+        )
+        login_session.cookies.clear()
+        return False
+    return True
+
+
+def save_session_cookies():
+    """Save login_session cookies, readable only by the current user
+
+    Cookies are saved in LWP format, which keeps each cookie's domain scoping
+    and HttpOnly flags
+    """
+    try:
+        # create file readable only by the current user before it is written,
+        # restricting permissions of a previously created file as well
+        os.close(
+            os.open(session_cookies_location, os.O_WRONLY | os.O_CREAT, 0o600)
+        )
+        os.chmod(session_cookies_location, 0o600)
+        saved_cookies = http.cookiejar.LWPCookieJar()
+        for cookie in login_session.cookies:
+            saved_cookies.set_cookie(cookie)
+        saved_cookies.save(str(session_cookies_location), ignore_discard=True)
+    except IOError as e:
+        logger.exception(f'{session_cookies_location} could not be written')
+
+
+if reuse_session and load_session_cookies():
+    logger.info(
+        f'Now reusing login session for {config.BASE_URL} saved in'
+        f' {session_cookies_location}'
+    )
+else:
+    logger.info(f'Now attempting to log into {config.BASE_URL}')
+    try:
+        login_response = login_session.post(
+            config.BASE_URL + config.LOGIN_PATH,
+            data=config.LOGIN_HEADERS
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'HTTP headers: {login_response.headers}')
+        login_response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        m = 'unable to establish network connection'
+        logger.exception(m)
+        raise requests.exceptions.ConnectionError(m) from e
+    if reuse_session:
+        save_session_cookies()
+
+
+# define exception raised by ranged downloader when a server responds to a
+# range request with anything other than the requested byte range
+class RangeNotHonoredError(Exception):
+    """Raised when a server does not honor an HTTP range request"""
+
+
+def remove_file(path):
+    """Remove file at path, if it exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# define ranged downloader, which splits a single large download into byte
+# ranges fetched concurrently over separate connections and written in place
+def ranged_download(session, url, dest, parts=4, params=None, headers=None):
+    """Download url to dest using parts concurrent HTTP range requests
+
+    Sends headers, such as conditional request headers, with the initial HEAD
+    request, and returns its response, after downloading if its status was
+    200; returns None, with dest removed, if the server does not advertise
+    support for byte ranges or does not honor range requests, so that a
+    single-stream download can be used instead
+    """
+    identity_headers = {'Accept-Encoding': 'identity'}
+    with session.head(
+        url,
+        params=params,
+        headers=dict(identity_headers, **(headers or {})),
+        allow_redirects=True,
+    ) as head_response:
+        if head_response.status_code == requests.codes.not_modified:
+            return head_response
+        if (
+            head_response.status_code != requests.codes.ok
+            or head_response.headers.get('Accept-Ranges') != 'bytes'
+            or not head_response.headers.get('Content-Length')
+        ):
+            return None
+        try:
+            length = int(head_response.headers['Content-Length'])
+        except ValueError:
+            return None
+    if length < parts:
+        return None
+
+    # preallocate destination file, so that each part can be written at its
+    # own offset
+    with open(dest, 'wb') as fp:
+        fp.truncate(length)
+
+    def download_part(start, end):
+        range_headers = dict(identity_headers, Range=f'bytes={start}-{end}')
+        with session.get(
+            url,
+            params=params,
+            headers=range_headers,
+            stream=True,
+        ) as part_response:
+            if (
+                part_response.status_code != requests.codes.partial_content
+                or not part_response.headers.get(
+                    'Content-Range', ''
+                ).startswith(f'bytes {start}-{end}/')
+            ):
+                raise RangeNotHonoredError(
+                    f'Range request for bytes {start}-{end} of {url} returned'
+                    f' status {part_response.status_code} with Content-Range'
+                    f' {part_response.headers.get("Content-Range")}'
+                )
+            with open(dest, 'r+b') as fp:
+                fp.seek(start)
+                for chunk in part_response.iter_content(
+                    chunk_size=DOWNLOAD_CHUNK_SIZE
+                ):
+                    if fp.tell() + len(chunk) > end + 1:
+                        raise IOError(
+                            f'Range request for bytes {start}-{end} of {url}'
+                            f' returned more data than requested'
+                        )
+                    fp.write(chunk)
+                if fp.tell() != end + 1:
+                    raise IOError(
+                        f'Range request for bytes {start}-{end} of {url} was'
+                        f' incomplete'
+                    )
+
+    # remove partially written destination file if any part fails, falling
+    # back to a single-stream download if range requests are not honored
+    part_size = -(-length // parts)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=parts
+        ) as executor:
+            part_futures = [
+                executor.submit(
+                    download_part,
+                    start,
+                    min(start + part_size, length) - 1,
+                )
+                for start in range(0, length, part_size)
+            ]
+            for part_future in part_futures:
+                part_future.result()
+    except RangeNotHonoredError:
+        remove_file(dest)
+        return None
+    except BaseException:
+        remove_file(dest)
+        raise
+    return head_response
+
+
+# define response writer, which reads an unencoded response body of known
+# length into a single preallocated buffer and writes it with one call, and
+# otherwise streams the response body to disk in fixed-size chunks; reads into
+# the buffer are bounded to fixed-size slices, since urllib3 implements
+# readinto as a read of the full slice length followed by a copy
+def save_response(response, dest):
+    """Write the body of streamed response to dest"""
+    try:
+        length = int(response.headers.get('Content-Length', 0))
+    except ValueError:
+        length = 0
+    if (
+        0 < length <= MAX_PREALLOCATED_DOWNLOAD_SIZE
+        and response.headers.get('Content-Encoding', 'identity') == 'identity'
+    ):
+        buffer = memoryview(bytearray(length))
+        position = 0
+        while position < length:
+            n = response.raw.readinto(
+                buffer[position:position + DOWNLOAD_CHUNK_SIZE]
             )
+            if not n:
+                break
+            position += n
+        if position < length:
+            raise IOError(
+                f'Response body was incomplete, with {position} of {length}'
+                f' bytes received'
+            )
+        with open(dest, 'wb') as fp:
+            fp.write(buffer)
     else:
-        logger.error(f'*** NO ITERATION OF DOWNLOAD "{k}" WAS SUCCESSFUL ***')
+        with open(dest, 'wb') as fp:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    fp.write(chunk)
+
 
-    if v['extract_zip'] and zipfile.is_zipfile(download_destination):
+# define download action runner, which iterates over each record of a single
+# download action until a successful download is obtained; download actions
+# are independent of each other, so runners are safe to execute concurrently
+# using the shared login session
+def run_action(k, action_list):
+    """Attempt each DownloadAction in action_list for download action k
+
+    Returns a tuple (k, success, download_destination, action, modified),
+    where action is the last DownloadAction attempted, download_destination
+    is its location, and modified is False if the server reported that the
+    previously downloaded file is unchanged
+    """
+    for action in action_list:
         logger.info(
-            f'Now attempting to extract file {v["zip_member_to_extract"]}'
-            f' from download "{k}" using zip decompression'
+            f'Now attempting download "{k}" using method {action.method} and'
+            f' metadata {action.metadata}'
         )
-        zip_file_contents_directory = (
-            download_directory / v['filename'].split('.')[0]
-        )
-        try:
-            with zipfile.ZipFile(str(download_destination.absolute())) as zfp:
-                zfp.extract(
-                    v['zip_member_to_extract'],
-                    zip_file_contents_directory,
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f'Full download instructions: {action.instructions}'
+            )
+        download_destination = action.destination
+        # make get method downloads conditional on the previously downloaded
+        # file having changed, if it still exists
+        filename = action.instructions['filename']
+        conditional_headers = {}
+        if (
+            action.method == 'GET'
+            and filename in download_validators
+            and download_destination.exists()
+        ):
+            etag, last_modified = download_validators[filename]
+            if etag:
+                conditional_headers['If-None-Match'] = etag
+            if last_modified:
+                conditional_headers['If-Modified-Since'] = last_modified
+        if action.parallel_parts > 1 and action.method == 'GET':
+            try:
+                head_response = ranged_download(
+                    login_session,
+                    action.url,
+                    download_destination,
+                    parts=action.parallel_parts,
+                    params=action.metadata,
+                    headers=conditional_headers,
+                )
+            except (requests.exceptions.RequestException, IOError) as e:
+                logger.exception(f'Download "{k}" was unsuccessful')
+                continue
+            if head_response is None:
+                logger.info(
+                    f'Download "{k}" does not support byte ranges, so a'
+                    f' single-stream download will be used'
                 )
+            elif head_response.status_code == requests.codes.not_modified:
                 logger.info(
-                    f'{v["zip_member_to_extract"]} was successfully extracted'
-                    f' from download "{k}" using zip decompression'
+                    f'Download "{k}" is unchanged since it was last'
+                    f' downloaded to {download_destination}, so it was skipped'
                 )
-        except (zipfile.BadZipFile, IOError) as e:
+                return k, True, download_destination, action, False
+            else:
+                logger.info(
+                    f'Download "{k}" was successful completed using'
+                    f' {action.parallel_parts} parallel parts'
+                )
+                download_validators[filename] = [
+                    head_response.headers.get('ETag'),
+                    head_response.headers.get('Last-Modified'),
+                ]
+                return k, True, download_destination, action, True
+        try:
+            download_response = _METHOD_DISPATCH[action.method](
+                login_session,
+                action,
+                conditional_headers,
+            )
+        except requests.exceptions.RequestException as e:
             logger.exception(
-                f'{v["zip_member_to_extract"]} was *not* successfully'
-                f' extracted from download "{k}" using zip decompression'
+                f'Download "{k}" using method {action.method} and metadata'
+                f' {action.metadata} could *NOT* be started'
             )
-        final_destination = pathlib.Path(v['zip_member_final_destination'])
+            continue
+        # write response body to disk, with response closed afterward so its
+        # connection is returned to the pool
+        with download_response:
+            if download_response.status_code == requests.codes.not_modified:
+                logger.info(
+                    f'Download "{k}" is unchanged since it was last'
+                    f' downloaded to {download_destination}, so it was skipped'
+                )
+                return k, True, download_destination, action, False
+            elif download_response.status_code == requests.codes.ok:
+                logger.info(f'Download "{k}" was successful started')
+                try:
+                    save_response(download_response, download_destination)
+                    logger.info(f'Download "{k}" was successful completed')
+                    if action.method == 'GET':
+                        download_validators[filename] = [
+                            download_response.headers.get('ETag'),
+                            download_response.headers.get('Last-Modified'),
+                        ]
+                    return k, True, download_destination, action, True
+                except (
+                    requests.exceptions.RequestException,
+                    urllib3.exceptions.HTTPError,
+                    IOError,
+                ) as e:
+                    logger.exception(f'Download "{k}" was unsuccessful')
+            else:
+                logger.warning(
+                    f'Download "{k}" using method {action.method} and'
+                    f' metadata {action.metadata} could *NOT* be started'
+                )
+    logger.error(f'*** NO ITERATION OF DOWNLOAD "{k}" WAS SUCCESSFUL ***')
+    return k, False, download_destination, action, True
+
+
+# define zip extractor, which extracts the zip file member specified by a
+# DownloadAction from its downloaded file
+def extract_member(k, download_destination, action):
+    """Extract zip file member specified by action for download action k"""
+    if zipfile.is_zipfile(download_destination):
+        logger.info(
+            f'Now attempting to extract file {action.zip_member}'
+            f' from download "{k}" using zip decompression'
+        )
+        final_destination = action.final_destination
         if final_destination.exists():
             logger.warning(
                 f'final destination {final_destination} for file'
-                f'{v["zip_member_to_extract"]} already exists'
+                f'{action.zip_member} already exists'
             )
         else:
             logger.info(
                 f'final destination {final_destination} for file'
-                f'{v["zip_member_to_extract"]} does not yet exist'
+                f'{action.zip_member} does not yet exist'
             )
+        # stream zip file member directly to its final destination, unless
+        # extracted members are also to be kept in the download archive, in
+        # which case the member is extracted to a subdirectory of same name as
+        # zip file and then copied, allowing the OS to copy without buffering
         try:
-            shutil.copy2(
-                str(zip_file_contents_directory / v['zip_member_to_extract']),
-                str(final_destination),
-            )
-            logger.info(
-                f'file {v["zip_member_to_extract"]} successfully copied to'
-                f' {final_destination}'
-            )
-        except IOError as e:
+            final_destination.parent.mkdir(parents=True, exist_ok=True)
+            with zipfile.ZipFile(download_destination) as zfp:
+                if archive_zip_members:
+                    zip_file_contents_directory = (
+                        download_directory
+                        / action.instructions['filename'].split('.')[0]
+                    )
+                    shutil.copyfile(
+                        zfp.extract(
+                            action.zip_member,
+                            zip_file_contents_directory,
+                        ),
+                        final_destination,
+                    )
+                else:
+                    with zfp.open(action.zip_member) as src_fp, \
+                            open(final_destination, 'wb') as dst_fp:
+                        shutil.copyfileobj(
+                            src_fp,
+                            dst_fp,
+                            length=ZIP_COPY_SIZE,
+                        )
+                logger.info(
+                    f'{action.zip_member} was successfully extracted'
+                    f' from download "{k}" to {final_destination} using zip'
+                    f' decompression'
+                )
+        except (zipfile.BadZipFile, KeyError, IOError) as e:
             logger.exception(
-                f'file {v["zip_member_to_extract"]} could *not* be copied to'
-                f' {final_destination}'
+                f'{action.zip_member} was *not* successfully'
+                f' extracted from download "{k}" to {final_destination} using'
+                f' zip decompression'
             )
-    elif v['extract_zip']:
+    else:
         logger.error(f'Download "{k}" is not a valid zip file')
 
+
+# submit all download actions to a thread pool, and then process results in
+# the order given in download actions dict, with each zip extraction submitted
+# to a separate thread pool so that it overlaps with remaining downloads
+download_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=max_download_workers
+)
+extract_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+extract_futures = []
+download_futures = [
+    download_executor.submit(run_action, k, action_list)
+    for k, action_list in download_actions.items()
+]
+for download_future in download_futures:
+    k, success, download_destination, action, modified = (
+        download_future.result()
+    )
+    if not success:
+        continue
+    if (
+        not modified
+        and action.extract_zip
+        and action.final_destination.exists()
+    ):
+        logger.info(
+            f'Download "{k}" is unchanged, so file {action.zip_member} was'
+            f' not extracted again to {action.final_destination}'
+        )
+        continue
+    if action.extract_zip:
+        extract_futures.append(
+            extract_executor.submit(
+                extract_member,
+                k,
+                download_destination,
+                action,
+            )
+        )
+download_executor.shutdown()
+
+# wait for all zip extractions to finish, surfacing any unexpected errors
+for extract_future in extract_futures:
+    extract_future.result()
+extract_executor.shutdown()
+
+# record ETag and Last-Modified values for use in the next run, keeping only
+# those for files of current download actions which still exist
+current_filenames = {
+    action.instructions['filename']
+    for action_list in download_actions.values()
+    for action in action_list
+    if action.destination.exists()
+}
+try:
+    with open(download_validators_location, 'w') as fp:
+        json.dump(
+            {
+                filename: validators
+                for filename, validators in download_validators.items()
+                if filename in current_filenames
+            },
+            fp,
+            indent=2,
+        )
+except IOError as e:
+    logger.exception(f'{download_validators_location} could not be written')
+
 logger.info(
     f'Total script execution time:'
     f' {time.perf_counter() - script_start_time:.02f} seconds'
@@ -20,11 +20,29 @@
 # -- filename, with value a string comprising the filename after download
 # -- extract_zip, with value a Boolean equivalent to either True or False
 # -- zip_member_to_extract, with value a string comprising the file to extract
-# from the downloaded file to a subdirectory of same name as zip file
+# from the downloaded file
 # -- zip_member_final_destination, with value a string giving the final location
-# to which the zip file member should be copied after extraction
+# to which the zip file member should be extracted
+# -- parallel_parts, optionally, with value an integer giving the number of
+# concurrent HTTP range requests to split a get method download into, if the
+# server supports byte ranges (default 1)
+# Optionally, this script may also provide the following constants:
+# - MAX_DOWNLOAD_WORKERS, an integer giving the number of download actions to
+# attempt concurrently (default 4)
+# - ARCHIVE_ZIP_MEMBERS, a Boolean giving whether extracted zip file members
+# should also be kept in a subdirectory of config.DOWNLOAD_ARCHIVE_DIRECTORY of
+# same name as zip file (default False)
+# - REUSE_SESSION, a Boolean giving whether login session cookies should be
+# saved in config.DOWNLOAD_ARCHIVE_DIRECTORY and reused by later runs instead
+# of logging in again, which also requires SESSION_CHECK_PATH (default False)
+# - SESSION_MAX_AGE, a number giving the age in seconds after which saved login
+# session cookies are no longer reused (default 1800)
+# - SESSION_CHECK_PATH, a string giving the path to an action requiring login,
+# which is used to check that saved login session cookies are still accepted,
+# with a redirect or a 401 or 403 response causing a new login
+# Debug messages are logged only if environment variable APP_LOG is set to
+# 'debug'.
 
-from collections import OrderedDict
 from datetime import datetime
 from pprint import pprint
 
@@ -46,12 +64,9 @@ LOGIN_HEADERS = {
     'custname':'test_username',
     'custemail':'test_email'
 }
-# create ordered dict of download actions
-DOWNLOAD_ACTIONS = OrderedDict()
-
-image_types = ['png','jpeg','webp','svg']
-for image_type in image_types:
-    DOWNLOAD_ACTIONS[image_type] = {
+# create dict of download actions, which preserves insertion order
+DOWNLOAD_ACTIONS = {
+    image_type: {
         'URL':f'{BASE_URL}image/{image_type}',
         'method':'get',
         'metadata':{},
@@ -62,6 +77,8 @@ for image_type in image_types:
         'zip_member_to_extract':None,
         'zip_member_final_destination':None,
     }
+    for image_type in ('png','jpeg','webp','svg')
+}
 
 
 if __name__ == '__main__':